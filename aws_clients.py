@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+boto3 クライアント / リソースの共通ファクトリ
+
+- boto3 は最初に client()/resource() が呼ばれた時点で import する（--help や --dry-run を軽くする）
+- 接続プールサイズ・リトライ・region/profile をここで一元管理する
+- client はスレッドセーフなので (service, region, profile, ...) ごとに1つをキャッシュ共有
+- resource はスレッドセーフではないためスレッドごとにキャッシュ
+"""
+
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", 50))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", 10))
+
+_overrides: Dict[str, Optional[str]] = {"region": None, "profile": None}
+_lock = threading.Lock()
+_sessions: Dict[Optional[str], Any] = {}
+_clients: Dict[Tuple, Any] = {}
+_local = threading.local()
+_event_handlers: List[Tuple[str, Callable]] = []
+_env_checked = False
+
+
+def configure(region: Optional[str] = None, profile: Optional[str] = None) -> None:
+    """明示的に指定された --region / --profile を設定する（各スクリプトのデフォルトより優先される）。
+    後から別の値が指定された場合（matchday --region A <command> --region B）は後の値が有効で、警告を出す"""
+    for name, value in (("region", region), ("profile", profile)):
+        if not value:
+            continue
+        current = _overrides[name]
+        if current and current != value:
+            print(f"[WARN] --{name} {value} overrides --{name} {current}", file=sys.stderr)
+        _overrides[name] = value
+
+
+def resolve_region(region_name: Optional[str] = None) -> Optional[str]:
+    """実際に使われる region を返す"""
+    return _overrides["region"] or region_name
+
+
+def register_event_handler(event_name: str, handler: Callable) -> None:
+    """botocore のイベントハンドラを登録（これ以降に作成される client / resource に適用される）"""
+    with _lock:
+        _event_handlers.append((event_name, handler))
+        for session in _sessions.values():
+            session.events.register(event_name, handler)
+
+
+def reset() -> None:
+    """キャッシュ済みの client / resource を破棄する（ハンドラ登録後に作り直したいとき用）"""
+    with _lock:
+        _clients.clear()
+    _local.resources = {}
+
+
+def _session(profile: Optional[str]):
+    # 呼び出し側で _lock を保持していること
+    if profile not in _sessions:
+        import boto3
+
+        session = boto3.session.Session(profile_name=profile)
+        for event_name, handler in _event_handlers:
+            session.events.register(event_name, handler)
+        _sessions[profile] = session
+    return _sessions[profile]
+
+
+def _install_instrumentation_from_env() -> None:
+    # スクリプト単体実行でも MATCHDAY_METRICS_DIR があれば計測を有効にする
+    global _env_checked
+    if _env_checked:
+        return
+    _env_checked = True
+    if os.getenv("MATCHDAY_METRICS_DIR"):
+        import instrumentation
+
+        instrumentation.install_from_env()
+
+
+def _config(max_pool_connections: Optional[int], user_agent_extra: Optional[str]):
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=max_pool_connections or DEFAULT_MAX_POOL_CONNECTIONS,
+        retries={"max_attempts": DEFAULT_MAX_ATTEMPTS, "mode": "standard"},
+        user_agent_extra=user_agent_extra,
+    )
+
+
+def _resolve(region_name: Optional[str], profile: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    return (resolve_region(region_name), _overrides["profile"] or profile)
+
+
+def client(
+    service: str,
+    region_name: Optional[str] = None,
+    profile: Optional[str] = None,
+    max_pool_connections: Optional[int] = None,
+    user_agent_extra: Optional[str] = None,
+):
+    """キャッシュ済みの low-level client を返す"""
+    _install_instrumentation_from_env()
+    region_name, profile = _resolve(region_name, profile)
+    key = (service, region_name, profile, max_pool_connections, user_agent_extra)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = _session(profile).client(
+                service,
+                region_name=region_name,
+                config=_config(max_pool_connections, user_agent_extra),
+            )
+        return _clients[key]
+
+
+def resource(
+    service: str,
+    region_name: Optional[str] = None,
+    profile: Optional[str] = None,
+    max_pool_connections: Optional[int] = None,
+    user_agent_extra: Optional[str] = None,
+):
+    """スレッドごとにキャッシュした resource を返す"""
+    _install_instrumentation_from_env()
+    region_name, profile = _resolve(region_name, profile)
+    key = (service, region_name, profile, max_pool_connections, user_agent_extra)
+    cache = getattr(_local, "resources", None)
+    if cache is None:
+        cache = _local.resources = {}
+    if key not in cache:
+        with _lock:
+            cache[key] = _session(profile).resource(
+                service,
+                region_name=region_name,
+                config=_config(max_pool_connections, user_agent_extra),
+            )
+    return cache[key]
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ローカルの DynamoDB / SNS 代替環境で各スクリプトの本処理を計測するベンチマーク
+
+- backend:
+  - moto:  moto の mock_aws でプロセス内に DynamoDB を立てる（pip install "moto[dynamodb]"）
+  - local: DynamoDB Local（--endpoint-url, 例: http://localhost:8000）
+- SNS は常にスタブ（publish を HTTP を送らずに成功扱いにする）
+- users / team_follows / watchlist / matches / announcements の合成データを --rows 件生成
+- シナリオごとに子プロセスで実行し、wall time / peak RSS / API 呼び出し数 / items/sec を JSON に記録
+  - RSS は本処理の間だけサンプリングし、開始時点からの増分（peak_rss_increase_kb）を比較に使う
+    （同じプロセスで行うデータ生成・投入の分を含めないため）
+- スクリプトの終了コードを exit_code に記録し、0 以外のシナリオがあれば終了コード 1（比較にも使わない）
+- --compare で既存の JSON と比較し、しきい値以上悪化したシナリオがあれば終了コード 1
+
+注意:
+- moto の TransactWriteItems は呼び出しごとにテーブル全体を deepcopy するため、
+  announce / migrate-* は件数に対してほぼ2乗で遅くなり、wall time と RSS は moto 側のコストが支配的になる。
+  moto ではこれらの件数を MOTO_TRANSACT_MAX_ROWS で打ち切る。
+  大きな件数や絶対値を見るときは DynamoDB Local（--backend local）を使うこと
+
+使い方:
+  python benchmark.py --rows 10000                                   # benchmark_baseline.json を作成
+  python benchmark.py --rows 10000 --compare benchmark_baseline.json # benchmark_current.json に書いて比較
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import aws_clients
+import dynamodb_keys
+
+REGION = "ap-northeast-1"
+# moto で TransactWriteItems を使うシナリオの件数上限（1000 件で約 20 秒・RSS 700 MB 程度かかる）
+MOTO_TRANSACT_MAX_ROWS = 500
+LANGS = ["en", "ja", "es", "fr", "ru"]
+
+# テーブル名 -> (HASH キー, RANGE キー)
+TABLES = {
+    "users": ("user_id", None),
+    "team_follows": ("userId", "teamId"),
+    "watchlist": ("user_id", "match_id"),
+    "matches": ("id", None),
+    "announcements": ("announcement_id", "lang"),
+}
+
+
+# ---------- 合成データ ----------
+def gen_users(n: int, rng: random.Random) -> Iterator[Dict[str, Any]]:
+    for i in range(n):
+        item = {"user_id": f"user-{i}", "lang_code": rng.choice(LANGS)}
+        # 1割は endpoint 未登録
+        if rng.random() >= 0.1:
+            item["push_endpoint_arn"] = f"arn:aws:sns:{REGION}:000000000000:endpoint/GCM/matchday/{i}"
+        yield item
+
+
+def gen_team_follows(n: int, rng: random.Random) -> Iterator[Dict[str, Any]]:
+    from migrate_team_follows import migration_map
+
+    old_ids = sorted(migration_map)
+    for i in range(n):
+        user, slot = divmod(i, 5)
+        if slot < 2:
+            team_id = str(old_ids[(user * 2 + slot) % len(old_ids)])  # 移行対象
+        elif slot == 2:
+            team_id = "99999"  # int だがマップなし
+        else:
+            team_id = f"af:team:9000{slot}"  # 移行済み
+        yield {"userId": f"user-{user}", "teamId": team_id}
+
+
+def gen_watchlist(n: int, rng: random.Random) -> Iterator[Dict[str, Any]]:
+    from migrate_watchlist import migration_map
+
+    old_ids = sorted(migration_map)
+    for i in range(n):
+        user, slot = divmod(i, 4)
+        match_id = old_ids[user % len(old_ids)] if slot == 0 else f"af:fixture:x{user}-{slot}"
+        yield {"user_id": f"user-{user}", "match_id": match_id}
+
+
+MATCH_COLUMNS = [
+    "utcDate", "status", "matchday",
+    "home_team_id", "home_team_name", "home_team_short_name", "home_team_tla", "home_team_crest",
+    "away_team_id", "away_team_name", "away_team_short_name", "away_team_tla", "away_team_crest",
+    "competition_id", "competition_name", "competition_emblem",
+]
+
+
+def write_match_csvs(n: int, rng: random.Random, directory: str, rows_per_file: int = 10000) -> None:
+    """matches 用 CSV を rows_per_file 件ずつ書き出す（奇数番目のファイルは gzip）"""
+    for f, start in enumerate(range(0, n, rows_per_file)):
+        path = os.path.join(directory, f"matches_{f:04d}.csv" + (".gz" if f % 2 else ""))
+        opener = gzip.open if f % 2 else open
+        with opener(path, "wt", newline="", encoding="utf-8") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(MATCH_COLUMNS)
+            for i in range(start, min(n, start + rows_per_file)):
+                season, rest = divmod(i, 380)
+                matchday, slot = divmod(rest, 10)
+                # 年は 25 シーズンで一巡するため、大会ごとにチーム ID を変えて id の衝突を避ける
+                base = 1000 + (season // 25) * 20
+                home, away = base + slot * 2, base + 1 + slot * 2
+                if matchday % 2:
+                    home, away = away, home
+                day = 1 + matchday % 28
+                writer.writerow([
+                    f"{2000 + season % 25}-{1 + matchday // 28 + 7:02d}-{day:02d}T15:00:00Z", "", str(matchday + 1),
+                    home, f"Team {home}", f"T{home}", f"T{home % 1000:02d}", "",
+                    away, f"Team {away}", f"T{away}", f"T{away % 1000:02d}", "",
+                    2000 + season // 25, f"Competition {season // 25}", "",
+                ])
+
+
+def write_announcement_csv(n: int, rng: random.Random, path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["key", "publish_at", "lang", "title", "body"])
+        for i in range(max(1, n // len(LANGS))):
+            for lang in LANGS:
+                writer.writerow([f"bench-{i}", "2026-01-01T00:00:00Z", lang, f"Title {i} {lang}", f"Body {i} {lang}"])
+
+
+# ---------- テーブル準備 ----------
+def create_table(client, name: str) -> None:
+    hash_key, range_key = TABLES[name]
+    try:
+        client.delete_table(TableName=name)
+        client.get_waiter("table_not_exists").wait(TableName=name)
+    except client.exceptions.ResourceNotFoundException:
+        pass
+    keys = [(hash_key, "HASH")] + ([(range_key, "RANGE")] if range_key else [])
+    client.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": k, "KeyType": t} for k, t in keys],
+        AttributeDefinitions=[{"AttributeName": k, "AttributeType": "S"} for k, _ in keys],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=name)
+
+
+def seed(client, name: str, items: Iterable[Dict[str, Any]]) -> int:
+    """items を 25 件ずつ BatchWriteItem で投入し、件数を返す（全件をリストに溜めない）"""
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    count = 0
+    it = iter(items)
+    while True:
+        requests = [
+            {"PutRequest": {"Item": {k: serializer.serialize(v) for k, v in item.items()}}}
+            for item in itertools.islice(it, 25)
+        ]
+        if not requests:
+            return count
+        count += len(requests)
+        request_items = {name: requests}
+        attempt = 0
+        while request_items:
+            resp = client.batch_write_item(RequestItems=request_items)
+            request_items = resp.get("UnprocessedItems") or {}
+            if request_items:
+                attempt += 1
+                if attempt >= dynamodb_keys.MAX_UNPROCESSED_ATTEMPTS:
+                    raise RuntimeError(f"{name}: items still unprocessed after {attempt} attempts")
+                dynamodb_keys.backoff_sleep(attempt)
+
+
+# ---------- シナリオ ----------
+class Scenario:
+    def __init__(self, name: str, tables: List[str], setup: Callable, run: Callable, transactional: bool = False):
+        self.name = name
+        self.tables = tables
+        self.setup = setup  # (client, rows, rng, workdir) -> 処理対象件数
+        self.run = run  # (workdir, backend) -> 終了コード
+        self.transactional = transactional  # TransactWriteItems を使う（moto では件数を打ち切る）
+
+    def rows_for(self, rows: int, backend: str) -> int:
+        if backend == "moto" and self.transactional:
+            return min(rows, MOTO_TRANSACT_MAX_ROWS)
+        return rows
+
+
+def _seed_setup(table: str, generator: Callable) -> Callable:
+    def setup(client, rows, rng, workdir):
+        return seed(client, table, generator(rows, rng))
+    return setup
+
+
+def _import_matches_setup(client, rows, rng, workdir):
+    write_match_csvs(rows, rng, workdir)
+    return rows
+
+
+def _announce_setup(client, rows, rng, workdir):
+    write_announcement_csv(rows, rng, os.path.join(workdir, "announcement.csv"))
+    return max(1, rows // len(LANGS)) * len(LANGS)
+
+
+def _exit_code(code: Any) -> int:
+    # sys.exit() と同じ解釈: None は 0、int はそのまま、それ以外は 1
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+
+def _main(module_name: str, argv: Callable[[str, str], List[str]]) -> Callable:
+    def run(workdir, backend):
+        import importlib
+        module = importlib.import_module(module_name)
+        try:
+            return _exit_code(module.main(argv(workdir, backend)))
+        except SystemExit as e:
+            return _exit_code(e.code)
+    return run
+
+
+def _writers(option: str, backend: str) -> List[str]:
+    # moto のテーブル状態は並行書き込みに耐えないため1スレッドで書く
+    return [option, "1"] if backend == "moto" else []
+
+
+SCENARIOS = {
+    s.name: s for s in [
+        Scenario("scan-team-follows", ["team_follows"], _seed_setup("team_follows", gen_team_follows),
+                 _main("scan_team_follows", lambda d, b: ["--output", "json"])),
+        Scenario("migrate-team-follows", ["team_follows"], _seed_setup("team_follows", gen_team_follows),
+                 _main("migrate_team_follows", lambda d, b: []), transactional=True),
+        Scenario("migrate-watchlist", ["watchlist"], _seed_setup("watchlist", gen_watchlist),
+                 _main("migrate_watchlist", lambda d, b: []), transactional=True),
+        Scenario("send-push", ["users"], _seed_setup("users", gen_users),
+                 _main("send_push_message", lambda d, b: [])),
+        Scenario("import-matches", ["matches"], _import_matches_setup,
+                 _main("import_matches_from_csv", lambda d, b: ["--csv-path", d] + _writers("--write-workers", b))),
+        Scenario("announce", ["announcements"], _announce_setup,
+                 _main("create_announcement", lambda d, b: ["--csv", os.path.join(d, "announcement.csv")] + _writers("--workers", b)), transactional=True),
+    ]
+}
+
+
+class _StubHTTPResponse:
+    status_code = 200
+    headers: Dict[str, str] = {}
+
+
+def stub_sns_publish(**kwargs):
+    """before-call.sns.Publish: HTTP を送らずに成功レスポンスを返す"""
+    return _StubHTTPResponse(), {"MessageId": "00000000-0000-0000-0000-000000000000", "ResponseMetadata": {}}
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS は bytes、Linux は KB
+    return rss // 1024 if platform.system() == "Darwin" else rss
+
+
+def current_rss_kb() -> Optional[int]:
+    """現在の RSS（Linux の /proc のみ。取れない環境では None）"""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler:
+    """本処理の間だけ現在の RSS をサンプリングして最大値を取る"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.before = current_rss_kb()
+        self.peak = self.before
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        rss = current_rss_kb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def run_scenario(name: str, rows: int, seed_value: int, backend: str) -> Dict[str, Any]:
+    """子プロセス内で実行: テーブル作成→データ投入→本処理を計測"""
+    scenario = SCENARIOS[name]
+    aws_clients.configure(region=REGION)
+
+    mock = None
+    if backend == "moto":
+        from moto import mock_aws
+        mock = mock_aws()
+        mock.start()
+
+    api_calls: Counter = Counter()
+    aws_clients.register_event_handler("before-call.sns.Publish", stub_sns_publish)
+
+    try:
+        client = aws_clients.client("dynamodb")
+        for table in scenario.tables:
+            create_table(client, table)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            items = scenario.setup(client, rows, random.Random(seed_value), workdir)
+
+            # 投入分は数えないよう、計測用のハンドラはここで登録し client キャッシュを作り直す
+            aws_clients.register_event_handler(
+                "before-parameter-build",
+                lambda event_name, **kwargs: api_calls.update([".".join(event_name.split(".")[1:3])]),
+            )
+            aws_clients.reset()
+
+            # send_push の1件ごとの WARNING ログを計測中は抑止
+            logging.disable(logging.WARNING)
+            with RssSampler() as rss, redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                exit_code = scenario.run(workdir, backend)
+                elapsed = time.perf_counter() - started
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    return {
+        "scenario": name,
+        "rows": rows,
+        "items": items,
+        # 0 以外はスクリプトが失敗を報告した（書き込み失敗など）。計測値は比較に使わない
+        "exit_code": exit_code,
+        "wall_time_s": round(elapsed, 4),
+        "items_per_s": round(items / elapsed, 1) if elapsed else None,
+        # /proc が無い環境では ru_maxrss（データ投入分を含むプロセス全体のピーク）で代用
+        "peak_rss_kb": rss.peak if rss.peak is not None else peak_rss_kb(),
+        "rss_before_run_kb": rss.before,
+        "peak_rss_increase_kb": rss.peak - rss.before if rss.before is not None else None,
+        "api_calls": dict(sorted(api_calls.items())),
+        "api_calls_total": sum(api_calls.values()),
+    }
+
+
+# 比較する指標（いずれも小さいほど良い）
+COMPARED_METRICS = ("wall_time_s", "peak_rss_increase_kb", "api_calls_total")
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fp:
+        return {r["scenario"]: r for r in json.load(fp)["results"]}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> int:
+    """baseline（load_baseline の結果）から threshold の割合を超えて悪化した指標の数を返す。
+    失敗したシナリオは比較せず、1件の回帰として数える"""
+    regressions = 0
+    for r in results:
+        if r.get("exit_code"):
+            regressions += 1
+            print(f"[FAILED] {r['scenario']}: exited with {r['exit_code']}, not compared", file=sys.stderr)
+            continue
+        base = baseline.get(r["scenario"])
+        if base is None or base.get("exit_code") or base["rows"] != r["rows"]:
+            print(f"{r['scenario']}: no comparable baseline", file=sys.stderr)
+            continue
+        for metric in COMPARED_METRICS:
+            if not base.get(metric) or r.get(metric) is None:
+                continue
+            if r[metric] > base[metric] * (1 + threshold):
+                regressions += 1
+                print(f"[REGRESSION] {r['scenario']} {metric}: {base[metric]} -> {r[metric]}", file=sys.stderr)
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark matchday scripts against a local DynamoDB/SNS stand-in.")
+    p.add_argument("--backend", choices=["moto", "local"], default="moto")
+    p.add_argument("--endpoint-url", default="http://localhost:8000", help="DynamoDB Local endpoint (--backend local)")
+    p.add_argument("--rows", type=int, default=10000,
+                   help=f"Synthetic rows per scenario (1e4 - 1e7; on moto, announce / migrate-* are capped at "
+                        f"{MOTO_TRANSACT_MAX_ROWS})")
+    p.add_argument("--seed", type=int, default=42, help="Random seed for synthetic data")
+    p.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                   help="Scenario to run (repeatable, default: all)")
+    p.add_argument("--output",
+                   help="Where to write the JSON results "
+                        "(default: benchmark_baseline.json, or benchmark_current.json with --compare)")
+    p.add_argument("--compare", help="Baseline JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown ratio before flagging a regression")
+    p.add_argument("--run-one", help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.output is None:
+        args.output = "benchmark_current.json" if args.compare else "benchmark_baseline.json"
+
+    # 比較元を上書きしないよう、書き込む前に読み込み、同じファイルの指定は拒否する
+    baseline = None
+    if args.compare and not args.run_one:
+        if os.path.abspath(args.output) == os.path.abspath(args.compare):
+            print("--output and --compare must be different files", file=sys.stderr)
+            return 2
+        baseline = load_baseline(args.compare)
+
+    # 実 AWS に向かないようダミーの認証情報を使う
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ["AWS_REGION"] = REGION
+    os.environ["AWS_DEFAULT_REGION"] = REGION
+    if args.backend == "local":
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+
+    if args.run_one:
+        result = run_scenario(args.run_one, args.rows, args.seed, args.backend)
+        print(json.dumps(result))
+        return 0
+
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        rows = SCENARIOS[name].rows_for(args.rows, args.backend)
+        if rows != args.rows:
+            print(f"{name}: capped at {rows} rows on moto (use --backend local for more)", file=sys.stderr)
+        # peak RSS をシナリオごとに分けるため子プロセスで実行
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", name,
+             "--backend", args.backend, "--endpoint-url", args.endpoint_url,
+             "--rows", str(rows), "--seed", str(args.seed)],
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{name}: {result['wall_time_s']}s, {result['items_per_s']} items/s, "
+              f"peak RSS {result['peak_rss_kb']} KB (+{result['peak_rss_increase_kb']} KB during run), "
+              f"{result['api_calls_total']} API calls")
+        if result.get("exit_code"):
+            print(f"[FAILED] {name}: exited with {result['exit_code']}", file=sys.stderr)
+        results.append(result)
+
+    with open(args.output, "w", encoding="utf-8") as fp:
+        json.dump({
+            "backend": args.backend,
+            "rows": args.rows,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "results": results,
+        }, fp, ensure_ascii=False, indent=2)
+    print(f"Wrote {args.output}")
+
+    failed = any(r.get("exit_code") for r in results)
+    if baseline is not None:
+        return 1 if compare(results, baseline, args.threshold) or failed else 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
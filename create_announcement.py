@@ -1,19 +1,30 @@
-import boto3
-import uuid
+import hashlib
 import csv
 import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from botocore.exceptions import BotoCoreError, ClientError
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('announcements')
+import aws_clients
 
-def generate_announcement_id():
-    now = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    suffix = uuid.uuid4().hex[:6]
-    return f"announcement#{now}_{suffix}"
+TABLE_NAME = 'announcements'
 
-def insert_announcement(announcement_id, lang, title, body, publish_at, dry_run=False):
-    item = {
+# key 列がない従来形式の CSV は1件のお知らせとして扱う
+DEFAULT_KEY = 'default'
+
+def generate_announcement_id(key, translations, publish_at=None):
+    """内容から決まる ID を生成（同じ CSV を再実行しても同じ ID になる）"""
+    h = hashlib.sha1(key.encode('utf-8'))
+    for lang in sorted(translations):
+        content = translations[lang]
+        h.update(f"\0{lang}\0{content['title']}\0{content['body']}".encode('utf-8'))
+    if publish_at:
+        h.update(f"\0{publish_at}".encode('utf-8'))
+    return f"announcement#{h.hexdigest()[:16]}"
+
+def build_item(announcement_id, lang, title, body, publish_at):
+    return {
         'announcement_id': announcement_id,
         'lang': lang,
         'title': title,
@@ -21,41 +32,98 @@ def insert_announcement(announcement_id, lang, title, body, publish_at, dry_run=
         'publish_at': publish_at,
         'is_active': True
     }
+
+def insert_announcement(announcement_id, translations, publish_at, dry_run=False):
+    """全言語分を1つの TransactWriteItems で書き込む。既に存在すれば何もしない"""
+    items = [
+        build_item(announcement_id, lang, content['title'], content['body'], publish_at)
+        for lang, content in translations.items()
+    ]
     if dry_run:
-        print(f"📝 Dry run: would insert [{lang}] → {item}")
-    else:
-        table.put_item(Item=item)
-        print(f"✅ Inserted [{lang}]")
+        for item in items:
+            print(f"📝 Dry run: would insert [{item['lang']}] → {item}")
+        return 'planned'
 
-def load_translations_from_csv(filepath):
-    translations = {}
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    try:
+        aws_clients.client('dynamodb').transact_write_items(
+            TransactItems=[
+                {
+                    'Put': {
+                        'TableName': TABLE_NAME,
+                        'Item': {k: serializer.serialize(v) for k, v in item.items()},
+                        'ConditionExpression': 'attribute_not_exists(announcement_id)',
+                    }
+                }
+                for item in items
+            ]
+        )
+    except ClientError as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if e.response['Error']['Code'] == 'TransactionCanceledException' and any(
+            r.get('Code') == 'ConditionalCheckFailed' for r in reasons
+        ):
+            print(f"⏭️  Already exists: {announcement_id}")
+            return 'skipped'
+        raise
+    print(f"✅ Inserted {announcement_id} [{', '.join(sorted(translations))}]")
+    return 'inserted'
+
+def load_announcements_from_csv(filepath):
+    """CSV を key ごとにまとめ、{key: {'publish_at': str|None, 'translations': {lang: {...}}}} を返す"""
+    announcements = {}
     with open(filepath, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
+            key = (row.get('key') or DEFAULT_KEY).strip()
+            publish_at = (row.get('publish_at') or '').strip() or None
             lang = row['lang'].strip()
             title = row['title'].strip()
             body = row['body'].strip()
-            translations[lang] = {"title": title, "body": body}
-    return translations
+            announcement = announcements.setdefault(key, {'publish_at': publish_at, 'translations': {}})
+            if publish_at and announcement['publish_at'] and publish_at != announcement['publish_at']:
+                raise ValueError(f"Conflicting publish_at for announcement '{key}'")
+            announcement['publish_at'] = announcement['publish_at'] or publish_at
+            announcement['translations'][lang] = {"title": title, "body": body}
+    return announcements
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Insert announcements into DynamoDB")
     parser.add_argument('--dry-run', action='store_true', help='Run in dry mode without inserting into DynamoDB')
-    parser.add_argument('--csv', type=str, default='announcement.csv', help='Path to the translations CSV file')
-    args = parser.parse_args()
-
-    translations = load_translations_from_csv(args.csv)
+    parser.add_argument('--csv', type=str, default='announcement.csv',
+                        help='Path to the translations CSV file (optional key / publish_at columns)')
+    parser.add_argument('--workers', type=int, default=8, help='Number of announcements written concurrently')
+    args = parser.parse_args(argv)
 
-    publish_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    print(f"📅 Using publish_at: {publish_at}")
+    announcements = load_announcements_from_csv(args.csv)
 
-    announcement_id = generate_announcement_id()
-    print(f"🆔 Generated Notice ID: {announcement_id}")
+    now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    print(f"📅 Default publish_at: {now}")
 
-    for lang, content in translations.items():
-        insert_announcement(announcement_id, lang, content['title'], content['body'], publish_at, dry_run=args.dry_run)
+    results = {'planned': 0, 'inserted': 0, 'skipped': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {}
+        for key, announcement in announcements.items():
+            announcement_id = generate_announcement_id(key, announcement['translations'], announcement['publish_at'])
+            print(f"🆔 {key} → {announcement_id}")
+            future = executor.submit(
+                insert_announcement,
+                announcement_id,
+                announcement['translations'],
+                announcement['publish_at'] or now,
+                dry_run=args.dry_run,
+            )
+            futures[future] = key
+        for future in as_completed(futures):
+            try:
+                results[future.result()] += 1
+            except (ClientError, BotoCoreError) as e:
+                results['failed'] += 1
+                print(f"❌ Failed {futures[future]}: {e}")
 
-    print("✅ Done (dry run mode: {})".format(args.dry_run))
+    print("✅ Done (dry run mode: {}) {}".format(args.dry_run, results))
+    return 0 if results['failed'] == 0 else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
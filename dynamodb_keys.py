@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scan 中心のスクリプト向けの、キーだけを持つ軽量レコード
+
+- low-level client の Scan に ProjectionExpression を付け、必要な属性だけを取得する
+  （resource 層の TypeDeserializer を通さない）
+- 1件を AttributeValue の dict ではなく str の tuple で持つ。値は sys.intern して
+  teamId / match_id のように重複の多い値を共有する
+- 書き込みが必要な行だけ iter_full_items()（BatchGetItem）で完全なアイテムを取り直す
+  （失敗したチャンクは例外を返して続行するので、呼び出し側で失敗件数に数える）
+"""
+
+import random
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+KeyRecord = Tuple[str, ...]
+
+
+def attr_str(v: Optional[Dict[str, Any]]) -> str:
+    """AttributeValue の S / N を文字列で返す（それ以外は空文字）"""
+    if v is None:
+        return ""
+    if "S" in v:
+        return v["S"]
+    if "N" in v:
+        return v["N"]
+    return ""
+
+
+def scan_keys(client, table_name: str, attrs: Sequence[str]) -> Iterator[KeyRecord]:
+    """attrs だけを Projection して Scan し、(attrs の順の) str の tuple を1件ずつ返す"""
+    names = {f"#a{i}": a for i, a in enumerate(attrs)}
+    params: Dict[str, Any] = {
+        "TableName": table_name,
+        "ProjectionExpression": ",".join(names),
+        "ExpressionAttributeNames": names,
+    }
+    intern = sys.intern
+    while True:
+        resp = client.scan(**params)
+        for it in resp.get("Items", []):
+            yield tuple(intern(attr_str(it.get(a))) for a in attrs)
+        eks = resp.get("LastEvaluatedKey")
+        if not eks:
+            break
+        params["ExclusiveStartKey"] = eks
+
+
+# BatchGetItem の上限
+BATCH_GET_SIZE = 100
+# UnprocessedKeys / UnprocessedItems を再送する最大回数と待ち時間（秒）
+MAX_UNPROCESSED_ATTEMPTS = 10
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 5.0
+
+
+def backoff_sleep(attempt: int) -> None:
+    """Full jitter の指数バックオフで待つ（attempt は 1 始まり）"""
+    time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+
+def iter_full_items(
+    client,
+    table_name: str,
+    key_names: Sequence[str],
+    keys: Iterable[KeyRecord],
+) -> Iterator[Tuple[KeyRecord, Optional[Dict[str, Any]], Optional[Exception]]]:
+    """キー（いずれも S 型）の tuple ごとに完全なアイテムを BatchGetItem で取得し、
+    入力順に (key, item, error) を返す。存在しなければ item は None。
+    BatchGetItem が失敗したチャンク（ClientError・通信エラー・再送上限）は、
+    そのチャンクのキーすべてに error を付けて返し、次のチャンクへ進む"""
+    chunk: List[KeyRecord] = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) == BATCH_GET_SIZE:
+            yield from _fetch_chunk(client, table_name, key_names, chunk)
+            chunk = []
+    if chunk:
+        yield from _fetch_chunk(client, table_name, key_names, chunk)
+
+
+def _fetch_chunk(client, table_name, key_names, chunk):
+    try:
+        found = _batch_get(client, table_name, key_names, chunk)
+    except Exception as e:
+        for key in chunk:
+            yield key, None, e
+        return
+    for key in chunk:
+        yield key, found.get(key), None
+
+
+def _batch_get(client, table_name, key_names, chunk) -> Dict[KeyRecord, Dict[str, Any]]:
+    found: Dict[KeyRecord, Dict[str, Any]] = {}
+    request = {
+        table_name: {
+            "Keys": [{k: {"S": v} for k, v in zip(key_names, key)} for key in set(chunk)],
+            "ConsistentRead": True,
+        }
+    }
+    attempt = 0
+    while request:
+        resp = client.batch_get_item(RequestItems=request)
+        for it in resp.get("Responses", {}).get(table_name, []):
+            found[tuple(attr_str(it.get(k)) for k in key_names)] = it
+        request = resp.get("UnprocessedKeys") or {}
+        if request:
+            # スロットリング時は例外ではなく UnprocessedKeys が返るため、間隔を空けて再送する
+            attempt += 1
+            if attempt >= MAX_UNPROCESSED_ATTEMPTS:
+                raise RuntimeError(
+                    f"{table_name}: {len(request[table_name]['Keys'])} keys still unprocessed after {attempt} attempts"
+                )
+            backoff_sleep(attempt)
+    return found
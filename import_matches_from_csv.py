@@ -1,59 +1,358 @@
 import csv
-import boto3
+import glob
+import gzip
 import hashlib
+import os
 import sys
+import time
 import argparse
+import multiprocessing
+import queue
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import aws_clients
+
+# 同一 matchday 内での日程変更として許容する最大のずれ（シーズン跨ぎの同カードと区別するため）
+MATCHDAY_WINDOW = timedelta(days=120)
+# BatchWriteItem の上限
+WRITE_CHUNK_SIZE = 25
+# パーサーがファイルごとに先読みしておくチャンク数（メモリ上限）
+PARSE_QUEUE_CHUNKS = 4
+
+# CSV 列 -> (item の属性名, 変換関数)。空文字は None として扱う
+MATCH_FIELDS = (
+    ('utcDate', 'utcDate', str),
+    ('status', 'status', str),
+    ('matchday', 'matchday', str),
+    ('home_team_id', 'home_team_id', int),
+    ('home_team_name', 'home_team_name', str),
+    ('home_team_short_name', 'home_team_short_name', str),
+    ('home_team_tla', 'home_team_tla', str),
+    ('home_team_crest', 'home_team_crest', str),
+    ('away_team_id', 'away_team_id', int),
+    ('away_team_name', 'away_team_name', str),
+    ('away_team_short_name', 'away_team_short_name', str),
+    ('away_team_tla', 'away_team_tla', str),
+    ('away_team_crest', 'away_team_crest', str),
+    ('competition_id', 'competition_id', int),
+    ('competition_name', 'competition_name', str),
+    ('competition_emblem', 'competition_emblem', str),
+)
+# id の解決・matchup_key に使うため空にできない列
+REQUIRED_COLUMNS = ('home_team_id', 'away_team_id', 'competition_id')
 
 def generate_match_id(home_team_id, away_team_id, utc_date):
     ids = sorted([str(home_team_id), str(away_team_id)])
-    # FIXME: utc_date can be changed so better not to use it.
+    # NOTE: 既存試合の id は build_match_index で解決するため、ここは新規試合にのみ使う
     base = f"{ids[0]}|{ids[1]}|{utc_date}"
     return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
 
-def main():
+def generate_matchup_key(home_team_id, away_team_id):
+    return f"{min(home_team_id, away_team_id)}-{max(home_team_id, away_team_id)}"
+
+def parse_utc_date(utc_date):
+    if not utc_date:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(utc_date).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def match_index_key(matchup_key, competition_id):
+    return (str(matchup_key), int(competition_id))
+
+def normalize_matchday(matchday):
+    return str(matchday) if matchday not in (None, '') else None
+
+def build_match_index(table):
+    """既存試合を1回の Scan（必要な属性のみ）で読み込み、
+    (matchup_key, competition_id) -> [(matchday, utcDate, id), ...] の索引を作る"""
+    index = {}
+    scan_kwargs = {
+        "ProjectionExpression": "#id,#mk,#c,#md,#d",
+        "ExpressionAttributeNames": {
+            "#id": "id",
+            "#mk": "matchup_key",
+            "#c": "competition_id",
+            "#md": "matchday",
+            "#d": "utcDate",
+        },
+    }
+    count = 0
+    while True:
+        resp = table.scan(**scan_kwargs)
+        for it in resp.get("Items", []):
+            if it.get("matchup_key") is None or it.get("competition_id") is None:
+                continue
+            key = match_index_key(it["matchup_key"], it["competition_id"])
+            index.setdefault(key, []).append(
+                (normalize_matchday(it.get("matchday")), parse_utc_date(it.get("utcDate")), it["id"])
+            )
+            count += 1
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    print(f"Indexed {count} existing matches ({len(index)} keys)")
+    return index
+
+def _closest(candidates, same_matchday, matchday, utc_date, max_delta):
+    """条件に合う候補のうち utcDate が最も近いものの (ずれ, 位置) を返す"""
+    best = None
+    for i, (existing_matchday, existing_date, _) in enumerate(candidates):
+        if (existing_matchday == matchday) != same_matchday:
+            continue
+        if utc_date is None or existing_date is None:
+            delta = timedelta(0) if utc_date is None and existing_date is None else None
+        else:
+            delta = abs(existing_date - utc_date)
+        if delta is None or delta > max_delta:
+            continue
+        if best is None or delta < best[0]:
+            best = (delta, i)
+    return best
+
+def resolve_match_id(index, key, matchday, utc_date, window):
+    """索引から既存試合の id を取り出す（見つかった候補は索引から外し、二重割り当てを防ぐ）。
+    同じ matchday の候補を優先し、なければ matchday が空・変更された試合として
+    window 以内の別 matchday の候補を探す"""
+    candidates = index.get(key)
+    if not candidates:
+        return None
+    best = _closest(candidates, True, matchday, utc_date,
+                    MATCHDAY_WINDOW if matchday is not None else window)
+    if best is None:
+        best = _closest(candidates, False, matchday, utc_date, window)
+    if best is None:
+        return None
+    return candidates.pop(best[1])[2]
+
+def assign_match_id(index, item, window):
+    """item の id を決め、(matchday, utcDate, id) を索引に戻す。
+    同じ実行内で同じ試合が別ファイル・別の日時で再登場しても同じ id になる"""
+    key = match_index_key(item['matchup_key'], item['competition_id'])
+    matchday = normalize_matchday(item['matchday'])
+    utc_date = parse_utc_date(item['utcDate'])
+    match_id = resolve_match_id(index, key, matchday, utc_date, window)
+    if match_id is None:
+        match_id = generate_match_id(item['home_team_id'], item['away_team_id'], item['utcDate'])
+    index.setdefault(key, []).append((matchday, utc_date, match_id))
+    return match_id
+
+def expand_csv_paths(patterns):
+    """glob / ディレクトリ / ファイルを CSV(.csv, .csv.gz) のパス一覧に展開する"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matched = glob.glob(os.path.join(pattern, '**', '*.csv'), recursive=True)
+            matched += glob.glob(os.path.join(pattern, '**', '*.csv.gz'), recursive=True)
+        else:
+            matched = glob.glob(pattern)
+        if not matched:
+            print(f"No CSV files matched: {pattern}", file=sys.stderr)
+        paths.extend(matched)
+    return sorted(set(paths))
+
+def open_csv(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='', encoding='utf-8')
+    return open(path, newline='', encoding='utf-8')
+
+def build_match_item(row):
+    """CSV 1行を id 以外の matches アイテムに正規化する"""
+    item = {'id': None}
+    for column, attr, convert in MATCH_FIELDS:
+        v = row[column]
+        item[attr] = convert(v) if v != '' else None
+    for column in REQUIRED_COLUMNS:
+        if item[column] is None:
+            raise ValueError(f"{column} is empty")
+    item['status'] = item['status'] or 'SCHEDULED'
+    item['matchup_key'] = generate_matchup_key(row['home_team_id'], row['away_team_id'])
+    return item
+
+def parse_csv_file(path, out, chunk_rows):
+    """プロセスプールで実行: 1ファイルを読み込み、正規化済みアイテムを chunk_rows 件ずつ out に流す。
+    最後に ('done', 件数, パース秒, キュー待ち秒) か ('error', メッセージ, 件数) を送る。
+    パース秒は読み込みと正規化だけの時間で、書き込み側が詰まってキューが空くのを待った時間は含めない"""
+    started = time.perf_counter()
+    waited = 0.0
+    reader = None
+    rows = 0
+
+    def put(msg):
+        nonlocal waited
+        t = time.perf_counter()
+        out.put(msg)
+        waited += time.perf_counter() - t
+
+    try:
+        with open_csv(path) as csvfile:
+            reader = csv.DictReader(csvfile)
+            chunk = []
+            for row in reader:
+                chunk.append(build_match_item(row))
+                if len(chunk) == chunk_rows:
+                    put(('items', chunk))
+                    rows += len(chunk)
+                    chunk = []
+            if chunk:
+                put(('items', chunk))
+                rows += len(chunk)
+    except Exception as e:
+        where = f"line {reader.line_num}: " if reader is not None else ""
+        out.put(('error', f"{where}{type(e).__name__}: {e}", rows))
+        return
+    out.put(('done', rows, time.perf_counter() - started - waited, waited))
+
+def iter_parsed(out, future):
+    """parse_csv_file の出力を読み出す。ワーカーが何も送らずに終わった場合もエラーとして返す"""
+    while True:
+        try:
+            msg = out.get(timeout=1)
+        except queue.Empty:
+            if not future.done():
+                continue
+            try:
+                msg = out.get_nowait()
+            except queue.Empty:
+                exc = future.exception()
+                yield ('error', f"parser exited without result: {exc!r}", None)
+                return
+        yield msg
+        if msg[0] != 'items':
+            return
+
+def get_table():
+    # resource はスレッドごとに aws_clients でキャッシュされる
+    return aws_clients.resource('dynamodb').Table('matches')
+
+def write_chunk(items):
+    with get_table().batch_writer(overwrite_by_pkeys=['id']) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    return len(items)
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Import matches from CSV to DynamoDB",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
-    parser.add_argument('--csv-path', help='Path to the CSV file')
-    parser.add_argument('--dry-run', action='store_true', help='Print only, do not write to DynamoDB')
-    args = parser.parse_args()
-
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table('matches')
-    with open(args.csv_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            match_id = generate_match_id(row['home_team_id'], row['away_team_id'], row['utcDate'])
-            item = {
-                'id': match_id,
-                'utcDate': row['utcDate'],
-                'status': row['status'] or 'SCHEDULED',
-                'matchday': row['matchday'] or None,
-                'home_team_id': int(row['home_team_id']),
-                'home_team_name': row['home_team_name'],
-                'home_team_short_name': row['home_team_short_name'],
-                'home_team_tla': row['home_team_tla'],
-                'home_team_crest': row['home_team_crest'],
-                'away_team_id': int(row['away_team_id']),
-                'away_team_name': row['away_team_name'],
-                'away_team_short_name': row['away_team_short_name'],
-                'away_team_tla': row['away_team_tla'],
-                'away_team_crest': row['away_team_crest'],
-                'competition_id': int(row['competition_id']),
-                'competition_name': row['competition_name'],
-                'competition_emblem': row['competition_emblem'],
-                'matchup_key': f"{min(row['home_team_id'], row['away_team_id'])}-{max(row['home_team_id'], row['away_team_id'])}"
-            }
-            # 空文字をNoneに変換
-            for k, v in item.items():
-                if v == '':
-                    item[k] = None
-            if args.dry_run:
-                print(f"[DRY RUN] Would insert/update: {item}")
-            else:
-                table.put_item(Item=item)
-                print(f"Inserted/Updated match: {item['id']}")
+    parser.add_argument('--csv-path', nargs='+', required=True,
+                        help='CSV files, globs or directories (.csv / .csv.gz)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print only, do not write to DynamoDB (still scans matches to resolve ids unless --no-index)')
+    parser.add_argument('--no-index', action='store_true',
+                        help='With --dry-run: skip the matches scan (no AWS calls); ids are printed as unresolved')
+    parser.add_argument('--window-days', type=int, default=3,
+                        help='Max kickoff shift (days) to treat a row without matchday, or with a different matchday, as the same existing match')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes parsing CSV files')
+    parser.add_argument('--chunk-rows', type=int, default=5000,
+                        help='Rows per chunk handed from the parsers to the writers')
+    parser.add_argument('--write-workers', type=int, default=8,
+                        help='Number of threads writing to DynamoDB (each id always goes to the same thread)')
+    args = parser.parse_args(argv)
+    if args.no_index and not args.dry_run:
+        # 索引なしで書き込むと日程変更のたびに重複が生まれるため、ドライラン専用
+        parser.error('--no-index can only be used with --dry-run')
+
+    paths = expand_csv_paths(args.csv_path)
+    if not paths:
+        return 1
+    print(f"Importing {len(paths)} file(s)")
+
+    index = {} if args.no_index else build_match_index(get_table())
+    window = timedelta(days=args.window_days)
+
+    lock = threading.Lock()
+    written = {}
+    finished_at = {}
+
+    failed = 0
+    started_at = {}
+    # 同じ id の書き込み順を保つため、id ごとに固定の1スレッドのレーンへ振り分ける
+    lanes = [ThreadPoolExecutor(max_workers=1) for _ in range(max(1, args.write_workers))]
+    # 書き込み待ちのバッチ数に上限を設け、パースが先行しすぎてメモリを食わないようにする
+    inflight = threading.BoundedSemaphore(len(lanes) * 8)
+
+    def on_written(path, future):
+        nonlocal failed
+        inflight.release()
+        with lock:
+            if future.exception() is not None:
+                failed += 1
+                print(f"[ERROR] batch write failed ({path}): {future.exception()}", file=sys.stderr)
+                return
+            written[path] = written.get(path, 0) + future.result()
+            finished_at[path] = time.perf_counter()
+
+    def submit_writes(path, items):
+        buffers = [[] for _ in lanes]
+        for item in items:
+            buffers[zlib.crc32(item['id'].encode('utf-8')) % len(lanes)].append(item)
+        for lane, buffer in zip(lanes, buffers):
+            for i in range(0, len(buffer), WRITE_CHUNK_SIZE):
+                inflight.acquire()
+                future = lane.submit(write_chunk, buffer[i:i + WRITE_CHUNK_SIZE])
+                future.add_done_callback(lambda f, p=path: on_written(p, f))
+
+    failed_files = []
+    try:
+        # Manager を内側にして先に閉じる。例外で抜けたとき、満杯のキューへの put で
+        # 止まっているパーサーが接続エラーで終わり、プールの終了待ちが固まらない
+        with ProcessPoolExecutor(max_workers=args.parse_workers) as parsers, \
+                multiprocessing.Manager() as manager:
+            outs = {p: manager.Queue(maxsize=PARSE_QUEUE_CHUNKS) for p in paths}
+            futures = {p: parsers.submit(parse_csv_file, p, outs[p], args.chunk_rows) for p in paths}
+            # id の割り当てを決定的にするため、完了順ではなくパス順に処理する
+            try:
+                for path in paths:
+                    for msg in iter_parsed(outs[path], futures[path]):
+                        if msg[0] == 'error':
+                            failed_files.append(path)
+                            print(f"[ERROR] {path}: {msg[1]} (skipped after {msg[2]} rows)", file=sys.stderr)
+                            break
+                        if msg[0] == 'done':
+                            _, rows, parse_elapsed, queue_wait = msg
+                            print(f"Parsed {path}: {rows} rows in {parse_elapsed:.2f}s "
+                                  f"({rows / parse_elapsed if parse_elapsed else 0:.0f} rows/s, "
+                                  f"{queue_wait:.2f}s blocked on a full queue)")
+                            break
+                        items = msg[1]
+                        # id の解決は索引を共有するためメインプロセスで行う
+                        for item in items:
+                            item['id'] = assign_match_id(index, item, window)
+                        if args.dry_run:
+                            for item in items:
+                                note = " (id unresolved: --no-index)" if args.no_index else ""
+                                print(f"[DRY RUN] Would insert/update{note}: {item}")
+                            continue
+                        started_at.setdefault(path, time.perf_counter())
+                        submit_writes(path, items)
+            except BaseException:
+                # 未着手のファイルは取り消し、例外はそのまま上げる（Ctrl-C を含む）
+                parsers.shutdown(wait=False, cancel_futures=True)
+                raise
+    finally:
+        for lane in lanes:
+            lane.shutdown()
+
+    if not args.dry_run:
+        for path in paths:
+            if path not in started_at:
+                continue
+            count = written.get(path, 0)
+            elapsed = finished_at.get(path, started_at[path]) - started_at[path]
+            print(f"Wrote {path}: {count} rows in {elapsed:.2f}s "
+                  f"({count / elapsed if elapsed else 0:.0f} rows/s)")
+        print(f"Inserted/Updated matches: {sum(written.values())} (failed batches: {failed})")
+    if failed_files:
+        print(f"Failed files ({len(failed_files)}): {', '.join(failed_files)}", file=sys.stderr)
+    return 0 if failed == 0 and not failed_files else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
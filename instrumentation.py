@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AWS 呼び出しの計測レイヤー（botocore のイベントにフックする）
+
+記録する内容（service / operation ごと）:
+- レイテンシのヒストグラム（リトライ込みの1呼び出し単位）
+- 試行回数・リトライ回数・スロットリング回数・エラー回数
+- DynamoDB の ConsumedCapacity 合計（ReturnConsumedCapacity=TOTAL を自動付与、テーブル単位）
+
+出力:
+- <metrics_dir>/<job>.json     : JSON
+- <metrics_dir>/<job>.prom     : Prometheus textfile collector 形式
+  interval 秒ごとと終了時（atexit）に書き出す
+
+有効化:
+- matchday CLI の --metrics-dir / --metrics-interval
+- もしくは環境変数 MATCHDAY_METRICS_DIR / MATCHDAY_METRICS_INTERVAL（各スクリプト単体実行時）
+
+aws_clients で client / resource を作る前に install() すること。
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aws_clients
+
+# 秒
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+THROTTLE_CODES = {
+    "ThrottlingException",
+    "Throttling",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+}
+_START_KEY = "matchday_metrics_start"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, total = [], 0
+        for upper, c in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += c
+            out.append(("+Inf" if upper == float("inf") else repr(upper), total))
+        return out
+
+
+class Metrics:
+    def __init__(self, job: str):
+        self.job = job
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.attempts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.retries: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.throttles: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.errors: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.capacity: Dict[Tuple[str, str], float] = defaultdict(float)
+
+    # ---------- botocore イベントハンドラ ----------
+    def on_before_parameter_build(self, context=None, **kwargs) -> None:
+        if context is not None:
+            context[_START_KEY] = time.perf_counter()
+
+    def on_provide_client_params(self, params=None, model=None, **kwargs) -> None:
+        # DynamoDB の対応オペレーションには ConsumedCapacity を返させる
+        if params is None or model is None or model.input_shape is None:
+            return
+        if "ReturnConsumedCapacity" in model.input_shape.members:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+    def on_response_received(self, event_name: str, parsed_response=None, exception=None, **kwargs) -> None:
+        key = _op_key(event_name)
+        code = _error_code(parsed_response)
+        with self._lock:
+            self.attempts[key] += 1
+            if code in THROTTLE_CODES:
+                self.throttles[key] += 1
+
+    def on_after_call(self, event_name: str, parsed=None, context=None, **kwargs) -> None:
+        key = _op_key(event_name)
+        elapsed = _elapsed(context)
+        parsed = parsed or {}
+        code = _error_code(parsed)
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        consumed = parsed.get("ConsumedCapacity")
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        with self._lock:
+            if elapsed is not None:
+                self.latency[key].observe(elapsed)
+            self.retries[key] += retries
+            if code:
+                self.errors[key + (code,)] += 1
+            for c in consumed or []:
+                self.capacity[(c.get("TableName", ""), key[1])] += float(c.get("CapacityUnits", 0))
+
+    def on_after_call_error(self, event_name: str, exception=None, context=None, **kwargs) -> None:
+        key = _op_key(event_name)
+        elapsed = _elapsed(context)
+        with self._lock:
+            if elapsed is not None:
+                self.latency[key].observe(elapsed)
+            self.errors[key + (type(exception).__name__,)] += 1
+
+    # ---------- 出力 ----------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ops = sorted(set(self.latency) | set(self.attempts))
+            operations = []
+            for service, operation in ops:
+                h = self.latency.get((service, operation))
+                operations.append({
+                    "service": service,
+                    "operation": operation,
+                    "calls": h.count if h else 0,
+                    "latency_sum_s": round(h.sum, 6) if h else 0.0,
+                    "latency_buckets": dict(h.cumulative()) if h else {},
+                    "attempts": self.attempts.get((service, operation), 0),
+                    "retries": self.retries.get((service, operation), 0),
+                    "throttles": self.throttles.get((service, operation), 0),
+                })
+            return {
+                "job": self.job,
+                "started_at": self.started_at,
+                "updated_at": time.time(),
+                "operations": operations,
+                "errors": [
+                    {"service": s, "operation": o, "code": c, "count": n}
+                    for (s, o, c), n in sorted(self.errors.items())
+                ],
+                "consumed_capacity": [
+                    {"table": t, "operation": o, "capacity_units": round(v, 3)}
+                    for (t, o), v in sorted(self.capacity.items())
+                ],
+            }
+
+    def to_prometheus(self, snap: Dict[str, Any]) -> str:
+        job = _label(snap["job"])
+        lines = [
+            "# HELP matchday_aws_request_duration_seconds AWS API call latency including retries.",
+            "# TYPE matchday_aws_request_duration_seconds histogram",
+        ]
+        for op in snap["operations"]:
+            labels = f'job="{job}",service="{op["service"]}",operation="{op["operation"]}"'
+            for le, n in op["latency_buckets"].items():
+                lines.append(f'matchday_aws_request_duration_seconds_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f"matchday_aws_request_duration_seconds_sum{{{labels}}} {op['latency_sum_s']}")
+            lines.append(f"matchday_aws_request_duration_seconds_count{{{labels}}} {op['calls']}")
+        for name, field, help_text in (
+            ("matchday_aws_request_attempts_total", "attempts", "HTTP attempts sent."),
+            ("matchday_aws_request_retries_total", "retries", "Retries performed by botocore."),
+            ("matchday_aws_request_throttles_total", "throttles", "Attempts rejected by throttling."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for op in snap["operations"]:
+                labels = f'job="{job}",service="{op["service"]}",operation="{op["operation"]}"'
+                lines.append(f"{name}{{{labels}}} {op[field]}")
+        lines += [
+            "# HELP matchday_aws_request_errors_total AWS API calls that ended in an error.",
+            "# TYPE matchday_aws_request_errors_total counter",
+        ]
+        for e in snap["errors"]:
+            lines.append(
+                f'matchday_aws_request_errors_total{{job="{job}",service="{e["service"]}",'
+                f'operation="{e["operation"]}",code="{_label(e["code"])}"}} {e["count"]}'
+            )
+        lines += [
+            "# HELP matchday_dynamodb_consumed_capacity_units_total DynamoDB ConsumedCapacity (TOTAL).",
+            "# TYPE matchday_dynamodb_consumed_capacity_units_total counter",
+        ]
+        for c in snap["consumed_capacity"]:
+            lines.append(
+                f'matchday_dynamodb_consumed_capacity_units_total{{job="{job}",table="{_label(c["table"])}",'
+                f'operation="{c["operation"]}"}} {c["capacity_units"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir: str) -> None:
+        snap = self.snapshot()
+        os.makedirs(metrics_dir, exist_ok=True)
+        _atomic_write(os.path.join(metrics_dir, f"{self.job}.json"), json.dumps(snap, indent=2))
+        _atomic_write(os.path.join(metrics_dir, f"{self.job}.prom"), self.to_prometheus(snap))
+
+
+def _op_key(event_name: str) -> Tuple[str, str]:
+    # 例: "after-call.dynamodb.Scan" -> ("dynamodb", "Scan")
+    parts = event_name.split(".")
+    return (parts[1] if len(parts) > 1 else "", parts[2] if len(parts) > 2 else "")
+
+
+def _elapsed(context: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not context or _START_KEY not in context:
+        return None
+    return time.perf_counter() - context[_START_KEY]
+
+
+def _error_code(parsed: Optional[Dict[str, Any]]) -> str:
+    if not parsed:
+        return ""
+    return parsed.get("Error", {}).get("Code", "")
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _atomic_write(path: str, content: str) -> None:
+    # textfile collector が書きかけのファイルを読まないよう rename で差し替える
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        fp.write(content)
+    os.replace(tmp, path)
+
+
+_installed: Optional[Metrics] = None
+
+
+def install(metrics_dir: str, interval: float = 60.0, job: Optional[str] = None) -> Metrics:
+    """ハンドラを登録し、定期出力スレッドと終了時の出力を設定する（2回目以降は何もしない）"""
+    global _installed
+    if _installed is not None:
+        return _installed
+
+    job = job or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "matchday"
+    metrics = Metrics(job)
+    aws_clients.register_event_handler("before-parameter-build", metrics.on_before_parameter_build)
+    aws_clients.register_event_handler("provide-client-params.dynamodb", metrics.on_provide_client_params)
+    aws_clients.register_event_handler("response-received", metrics.on_response_received)
+    aws_clients.register_event_handler("after-call", metrics.on_after_call)
+    aws_clients.register_event_handler("after-call-error", metrics.on_after_call_error)
+
+    if interval and interval > 0:
+        def loop():
+            while True:
+                time.sleep(interval)
+                metrics.write(metrics_dir)
+
+        threading.Thread(target=loop, name="matchday-metrics", daemon=True).start()
+    atexit.register(metrics.write, metrics_dir)
+
+    _installed = metrics
+    return metrics
+
+
+def install_from_env(job: Optional[str] = None) -> Optional[Metrics]:
+    metrics_dir = os.getenv("MATCHDAY_METRICS_DIR")
+    if not metrics_dir:
+        return None
+    return install(metrics_dir, float(os.getenv("MATCHDAY_METRICS_INTERVAL", 60)), job=job)
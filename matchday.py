@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+matchday 運用スクリプトの統合エントリポイント
+
+使い方:
+  python matchday.py [--region REGION] [--profile PROFILE] <command> [command options]
+
+各サブコマンドのモジュールは実行時に初めて import する。
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from typing import List, Optional
+
+import aws_clients
+
+# サブコマンド名 -> (モジュール名, 説明)
+COMMANDS = {
+    "import-matches": ("import_matches_from_csv", "Import matches from CSV to DynamoDB"),
+    "announce": ("create_announcement", "Insert announcements into DynamoDB"),
+    "migrate-team-follows": ("migrate_team_follows", "Migrate team_follows.teamId by migration_map"),
+    "migrate-watchlist": ("migrate_watchlist", "Migrate watchlist.match_id by migration_map"),
+    "scan-team-follows": ("scan_team_follows", "Count team_follows records by teamId and userId"),
+    "send-push": ("send_push_message", "Send push notifications to all users via SNS"),
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="matchday", description="Matchday operation scripts.")
+    p.add_argument("--region", help="AWS region (overrides each script's default; a command's own --region wins)")
+    p.add_argument("--profile", help="AWS profile name")
+    p.add_argument("--metrics-dir", default=os.getenv("MATCHDAY_METRICS_DIR"),
+                   help="Write AWS call metrics (JSON / Prometheus textfile) to this directory")
+    p.add_argument("--metrics-interval", type=float, default=float(os.getenv("MATCHDAY_METRICS_INTERVAL", 60)),
+                   help="Seconds between metrics writes (0: only at exit)")
+    sub = p.add_subparsers(dest="command", metavar="<command>", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        # オプションは各スクリプト側の argparse に任せる
+        sub.add_parser(name, help=help_text, add_help=False)
+    return p.parse_known_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args, rest = parse_args(argv)
+    aws_clients.configure(region=args.region, profile=args.profile)
+    if args.metrics_dir:
+        import instrumentation
+
+        instrumentation.install(args.metrics_dir, args.metrics_interval, job=args.command.replace("-", "_"))
+
+    module_name, _ = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+    sys.argv[0] = f"matchday {args.command}"
+    return module.main(rest) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,7 @@
 team_follows-stg テーブルの teamId マイグレーションスクリプト
 
 要件:
-1) 全データ取得（Scan）
+1) 全データ取得（Scan、キー userId / teamId のみ Projection）
 2) teamId が int に変換できるもののみ抽出し、総数を表示
 3) 抽出されたレコードのみ更新（= 新teamIdへ移し替え）
    - マイグレーションマップ（migration_map）から新teamIdを取得
@@ -17,18 +17,21 @@ team_follows-stg テーブルの teamId マイグレーションスクリプト
   TransactWriteItems で実施。
 - Put は二重作成を防ぐため条件付き（新キーが未存在なら）
 - Delete は念のため条件付き（旧キーが存在なら）
+- Scan ではキーだけを保持し、移行するレコードのみ BatchGetItem で全属性を取り直す
 """
 
 import os
 import sys
 import math
 import time
-from typing import Dict, Any, List, Tuple
+import argparse
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
-import boto3
-from botocore.config import Config
 from botocore.exceptions import ClientError
 
+import aws_clients
+import dynamodb_keys
+
 
 # ======== ここを編集してください（例）========
 # 旧 teamId(int) -> 新 teamId(str) の対応を記載
@@ -117,15 +120,21 @@ migration_map: Dict[int, str] = {
 TABLE_NAME = os.environ.get("TABLE_NAME", "team_follows")
 AWS_REGION = os.environ.get("AWS_REGION", "ap-northeast-1")
 
-# DynamoDB client（強化リトライ設定）
-dynamodb = boto3.client(
-    "dynamodb",
-    region_name=AWS_REGION,
-    config=Config(
-        retries={"max_attempts": 10, "mode": "standard"},
+
+def get_dynamodb():
+    """DynamoDB client（リトライ・接続プールは aws_clients で設定）"""
+    return aws_clients.client(
+        "dynamodb",
+        region_name=AWS_REGION,
         user_agent_extra="team-follows-migrator/1.0",
-    ),
-)
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Migrate team_follows.teamId (SK) from old int ids by migration_map.")
+    p.add_argument("--table", default=TABLE_NAME, help=f"DynamoDB table name (default: {TABLE_NAME})")
+    p.add_argument("--region", help=f"AWS region (default: {AWS_REGION})")
+    return p.parse_args(argv)
 
 
 def is_int_like(s: Any) -> bool:
@@ -139,38 +148,16 @@ def is_int_like(s: Any) -> bool:
         return False
 
 
-def scan_all_items(table_name: str) -> List[Dict[str, Any]]:
-    """テーブル全件を Scan で取得（ページング対応）"""
-    items: List[Dict[str, Any]] = []
-    exclusive_start_key = None
-
-    while True:
-        params = {"TableName": table_name}
-        if exclusive_start_key:
-            params["ExclusiveStartKey"] = exclusive_start_key
-
-        resp = dynamodb.scan(**params)
-        items.extend(resp.get("Items", []))
-
-        exclusive_start_key = resp.get("LastEvaluatedKey")
-        if not exclusive_start_key:
-            break
-
-    return items
+def scan_all_keys(table_name: str) -> Iterator[Tuple[str, str]]:
+    """テーブル全件のキー (userId, teamId) を Scan で順に返す（ページング対応）"""
+    return dynamodb_keys.scan_keys(get_dynamodb(), table_name, ("userId", "teamId"))
 
 
-def as_s(item: Dict[str, Any], key: str) -> str:
-    """DynamoDB AttributeValue から文字列（S）を安全に取り出す"""
-    v = item.get(key)
-    if v is None:
-        return ""
-    # サポート: {"S": "str"}, {"N": "123"} を文字列化
-    if "S" in v:
-        return v["S"]
-    if "N" in v:
-        return v["N"]
-    # それ以外（例: NULL, BOOL）は用途外
-    return ""
+def fetch_items(
+    table_name: str, keys: List[Tuple[str, str]]
+) -> Iterator[Tuple[Tuple[str, str], Optional[Dict[str, Any]], Optional[Exception]]]:
+    """移し替え対象の旧アイテムを全属性で取得（BatchGetItem、入力順）"""
+    return dynamodb_keys.iter_full_items(get_dynamodb(), table_name, ("userId", "teamId"), keys)
 
 
 def build_put_item(new_team_id: str, old_item: Dict[str, Any]) -> Dict[str, Any]:
@@ -221,24 +208,24 @@ def transact_put_delete(
         ]
     }
 
-    dynamodb.transact_write_items(**request)
+    get_dynamodb().transact_write_items(**request)
 
 
-def main() -> int:
-    print(f"Target table: {TABLE_NAME} (region={AWS_REGION})")
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    table = args.table
+    aws_clients.configure(region=args.region)
 
-    # 1) 全件取得
-    items = scan_all_items(TABLE_NAME)
-    total = len(items)
-    print(f"scanned items: {total}")
+    print(f"Target table: {table} (region={aws_clients.resolve_region(AWS_REGION)})")
 
-    # 2) teamId が int に変換できるレコードのみ抽出
-    candidates: List[Tuple[Dict[str, Any], str, int]] = []  # (item, user_id, old_team_id_int)
-    for it in items:
-        user_id = as_s(it, "userId")
-        team_id_raw = as_s(it, "teamId")
+    # 1) 全件取得（キーのみ） + 2) teamId が int に変換できるレコードのみ抽出
+    total = 0
+    candidates: List[Tuple[str, str, int]] = []  # (user_id, team_id_raw, old_team_id_int)
+    for user_id, team_id_raw in scan_all_keys(table):
+        total += 1
         if is_int_like(team_id_raw):
-            candidates.append((it, user_id, int(team_id_raw)))
+            candidates.append((user_id, team_id_raw, int(team_id_raw)))
+    print(f"scanned items: {total}")
 
     print(f"int-convertible teamId count: {len(candidates)}")
 
@@ -247,20 +234,32 @@ def main() -> int:
     failed = 0
     skipped_no_map = 0
 
-    for it, user_id, old_team_id_int in candidates:
-        old_team_id_str = str(old_team_id_int)
-
+    to_migrate: List[Tuple[str, str, str]] = []  # (user_id, team_id_raw, new_team_id)
+    for user_id, team_id_raw, old_team_id_int in candidates:
         # マップがない場合はスキップ（要件に忠実: マップから新teamIdを取得して上書き）
         if old_team_id_int not in migration_map:
             skipped_no_map += 1
             continue
+        to_migrate.append((user_id, team_id_raw, str(migration_map[old_team_id_int])))  # 文字列で格納
+
+    # 書き込む行だけ全属性を取得
+    fetched = fetch_items(table, [(user_id, team_id_raw) for user_id, team_id_raw, _ in to_migrate])
+    for (user_id, team_id_raw, new_team_id), (_, it, error) in zip(to_migrate, fetched):
+        old_team_id_str = str(int(team_id_raw))
+        if error is not None:
+            failed += 1
+            print(f"[ERROR] userId={user_id}, old_teamId={team_id_raw}: batch get failed: {error}", file=sys.stderr)
+            continue
+        if it is None:
+            failed += 1
+            print(f"[ERROR] userId={user_id}, old_teamId={team_id_raw}: item disappeared after scan", file=sys.stderr)
+            continue
 
-        new_team_id = str(migration_map[old_team_id_int])  # 文字列で格納
         new_item = build_put_item(new_team_id, it)
 
         try:
             transact_put_delete(
-                table_name=TABLE_NAME,
+                table_name=table,
                 user_id=user_id,
                 old_team_id=old_team_id_str,
                 new_item=new_item,
@@ -5,7 +5,7 @@
 watchlist テーブルの match_id マイグレーションスクリプト（ドライラン対応）
 
 機能:
-1) 全件 Scan
+1) 全件 Scan（キー user_id / match_id のみ Projection）
 2) migration_map(旧match_id→新match_id) にヒットするレコードのみ対象化
 3) Put(新キー) + Delete(旧キー) を TransactWriteItems で同一トランザクション実行
    - Put は attribute_not_exists(user_id)
@@ -15,17 +15,19 @@ watchlist テーブルの match_id マイグレーションスクリプト（ド
 
 注意:
 - watchlist: PK=user_id(S), SK=match_id(S) を前提
+- Scan ではキーだけを保持し、実行モードで移行するレコードのみ BatchGetItem で全属性を取り直す
 """
 
 import os
 import sys
 import argparse
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
-import boto3
-from botocore.config import Config
 from botocore.exceptions import ClientError
 
+import aws_clients
+import dynamodb_keys
+
 # ========= ここを編集してください =========
 # 旧 match_id (str) -> 新 match_id (str)
 migration_map: Dict[str, str] = {
@@ -45,49 +47,32 @@ migration_map: Dict[str, str] = {
 TABLE_NAME = os.environ.get("TABLE_NAME", "watchlist")
 AWS_REGION = os.environ.get("AWS_REGION", "ap-northeast-1")
 
-dynamodb = boto3.client(
-    "dynamodb",
-    region_name=AWS_REGION,
-    config=Config(
-        retries={"max_attempts": 10, "mode": "standard"},
+
+def get_dynamodb():
+    return aws_clients.client(
+        "dynamodb",
+        region_name=AWS_REGION,
         user_agent_extra="watchlist-matchid-migrator/1.1",
-    ),
-)
+    )
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv=None) -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Migrate watchlist.match_id (SK) from old to new by migration_map.")
     p.add_argument("--table", default=TABLE_NAME, help=f"DynamoDB table name (default: {TABLE_NAME})")
-    p.add_argument("--region", default=AWS_REGION, help=f"AWS region (default: {AWS_REGION})")
+    p.add_argument("--region", help=f"AWS region (default: {AWS_REGION})")
     p.add_argument("--dry-run", action="store_true", help="実行せず計画のみ表示（書き込みなし）")
     p.add_argument("--verbose", action="store_true", help="対象レコードを詳細表示（user_id, old→new）")
-    return p.parse_args()
-
-
-def scan_all_items(table_name: str) -> List[Dict[str, Any]]:
-    items: List[Dict[str, Any]] = []
-    eks = None
-    while True:
-        params = {"TableName": table_name}
-        if eks:
-            params["ExclusiveStartKey"] = eks
-        resp = dynamodb.scan(**params)
-        items.extend(resp.get("Items", []))
-        eks = resp.get("LastEvaluatedKey")
-        if not eks:
-            break
-    return items
-
-
-def as_s(item: Dict[str, Any], key: str) -> str:
-    v = item.get(key)
-    if v is None:
-        return ""
-    if "S" in v:
-        return v["S"]
-    if "N" in v:
-        return v["N"]
-    return ""
+    return p.parse_args(argv)
+
+
+def scan_all_keys(table_name: str) -> Iterator[Tuple[str, str]]:
+    return dynamodb_keys.scan_keys(get_dynamodb(), table_name, ("user_id", "match_id"))
+
+
+def fetch_items(
+    table_name: str, keys: List[Tuple[str, str]]
+) -> Iterator[Tuple[Tuple[str, str], Optional[Dict[str, Any]], Optional[Exception]]]:
+    return dynamodb_keys.iter_full_items(get_dynamodb(), table_name, ("user_id", "match_id"), keys)
 
 
 def build_put_item_with_new_match_id(old_item: Dict[str, Any], new_match_id: str) -> Dict[str, Any]:
@@ -120,15 +105,16 @@ def transact_put_delete(table_name: str, user_id: str, old_match_id: str, new_it
             },
         ]
     }
-    dynamodb.transact_write_items(**request)
+    get_dynamodb().transact_write_items(**request)
 
 
-def main() -> int:
-    args = parse_args()
+def main(argv=None) -> int:
+    args = parse_args(argv)
 
-    # env/引数の最終決定（clientはすでに初期化済みだが表示用に記録）
+    # env/引数の最終決定（client は初回呼び出し時にこの region で作られる）
     table = args.table
-    region = args.region
+    aws_clients.configure(region=args.region)
+    region = aws_clients.resolve_region(AWS_REGION)
 
     print(f"Target table: {table} (region={region})")
     print(f"migration_map size: {len(migration_map)}")
@@ -137,20 +123,16 @@ def main() -> int:
         print("migration_map が空です。旧→新の対応を設定してください。", file=sys.stderr)
         return 2
 
-    # 1) 全件取得
-    items = scan_all_items(table)
-    total = len(items)
-    print(f"scanned items: {total}")
-
-    # 2) 対象抽出
-    candidates: List[Tuple[Dict[str, Any], str, str]] = []
-    for it in items:
-        user_id = as_s(it, "user_id")
-        old_match_id = as_s(it, "match_id")
+    # 1) 全件取得（キーのみ） + 2) 対象抽出
+    total = 0
+    candidates: List[Tuple[str, str]] = []
+    for user_id, old_match_id in scan_all_keys(table):
+        total += 1
         if not user_id or not old_match_id:
             continue
         if old_match_id in migration_map:
-            candidates.append((it, user_id, old_match_id))
+            candidates.append((user_id, old_match_id))
+    print(f"scanned items: {total}")
     print(f"target records (hit in migration_map): {len(candidates)}")
 
     # 3) 実行 or ドライラン
@@ -159,7 +141,8 @@ def main() -> int:
     failed = 0
     skipped_same = 0
 
-    for it, user_id, old_match_id in candidates:
+    to_migrate: List[Tuple[str, str, str]] = []  # (user_id, old_match_id, new_match_id)
+    for user_id, old_match_id in candidates:
         new_match_id = str(migration_map[old_match_id])
         if old_match_id == new_match_id:
             skipped_same += 1
@@ -173,7 +156,20 @@ def main() -> int:
                 print(f"[PLAN] user_id={user_id} {old_match_id} -> {new_match_id}")
             continue
 
-        # 実行モード
+        to_migrate.append((user_id, old_match_id, new_match_id))
+
+    # 実行モード: 書き込む行だけ全属性を取得
+    fetched = fetch_items(table, [(user_id, old_match_id) for user_id, old_match_id, _ in to_migrate])
+    for (user_id, old_match_id, new_match_id), (_, it, error) in zip(to_migrate, fetched):
+        if error is not None:
+            failed += 1
+            print(f"[ERROR] user_id={user_id}, old_match_id={old_match_id}: batch get failed: {error}", file=sys.stderr)
+            continue
+        if it is None:
+            failed += 1
+            print(f"[ERROR] user_id={user_id}, old_match_id={old_match_id}: item disappeared after scan", file=sys.stderr)
+            continue
+
         new_item = build_put_item_with_new_match_id(it, new_match_id)
         try:
             transact_put_delete(table, user_id, old_match_id, new_item)
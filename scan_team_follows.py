@@ -3,78 +3,60 @@ import argparse
 import json
 import os
 from collections import Counter
-from typing import Dict, List, Tuple
+from typing import Iterable, Iterator, List, Tuple
 
-import boto3
-from botocore.config import Config
+import aws_clients
+import dynamodb_keys
 
 
-def scan_all(table, projection_expr: str = "#u,#t", expr_attr_names=None) -> List[Dict]:
-    """Table.scan のページネーションを処理して全件取得"""
-    if expr_attr_names is None:
-        expr_attr_names = {"#u": "userId", "#t": "teamId"}
+def scan_all(client, table_name: str, attrs: Tuple[str, ...] = ("userId", "teamId")) -> Iterator[Tuple[str, ...]]:
+    """low-level Scan のページネーションを処理し、attrs だけの tuple を1件ずつ返す"""
+    return dynamodb_keys.scan_keys(client, table_name, attrs)
 
-    items = []
-    scan_kwargs = {
-        "ProjectionExpression": projection_expr,
-        "ExpressionAttributeNames": expr_attr_names,
-    }
 
-    while True:
-        resp = table.scan(**scan_kwargs)
-        items.extend(resp.get("Items", []))
-        if "LastEvaluatedKey" not in resp:
-            break
-        scan_kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
-    return items
-
-
-def count_and_sort(items: List[Dict]) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+def count_and_sort(keys: Iterable[Tuple[str, str]]) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]], int]:
+    """(userId, teamId) を数え、件数の降順に並べたものと総数を返す"""
     team_counts = Counter()
     user_counts = Counter()
-    for it in items:
-        # PK/SK は必ずある前提だが、念のため get で読む
-        u = it.get("userId")
-        t = it.get("teamId")
-        if u is not None:
+    total = 0
+    for u, t in keys:
+        total += 1
+        # PK/SK は必ずある前提だが、念のため空文字は数えない
+        if u:
             user_counts[u] += 1
-        if t is not None:
+        if t:
             team_counts[t] += 1
 
     team_sorted = sorted(team_counts.items(), key=lambda x: x[1], reverse=True)
     user_sorted = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)
-    return team_sorted, user_sorted
+    return team_sorted, user_sorted, total
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('team_follows')
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Count records by teamId and userId from a DynamoDB table.")
-    # parser.add_argument("--table", required=True, help="DynamoDB table name")
-    # parser.add_argument("--region", default=os.getenv("AWS_REGION") or "ap-northeast-1")
-    # parser.add_argument("--profile", default=os.getenv("AWS_PROFILE"))
+    parser.add_argument("--table", default="team_follows", help="DynamoDB table name")
+    parser.add_argument("--region", help="AWS region (default: AWS_REGION)")
+    parser.add_argument("--profile", help="AWS profile name (default: AWS_PROFILE)")
     parser.add_argument("--output", choices=["json", "text"], default="json")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    # session = boto3.Session(profile_name=args.profile) if args.profile else boto3.Session()
-    # dynamodb = session.resource("dynamodb", region_name=args.region, config=Config(retries={"max_attempts": 10}))
-    # table = dynamodb.Table(args.table)
+    aws_clients.configure(region=args.region, profile=args.profile)
+    client = aws_clients.client("dynamodb", region_name=os.getenv("AWS_REGION"), profile=os.getenv("AWS_PROFILE"))
 
-    items = scan_all(table)
-    team_sorted, user_sorted = count_and_sort(items)
+    team_sorted, user_sorted, total = count_and_sort(scan_all(client, args.table))
 
     if args.output == "json":
         print(json.dumps(
             {
                 "team_counts_desc": [{"teamId": k, "count": v} for k, v in team_sorted],
                 "user_counts_desc": [{"userId": k, "count": v} for k, v in user_sorted],
-                "total_items": len(items),
+                "total_items": total,
             },
             ensure_ascii=False,
             indent=2,
         ))
     else:
-        print(f"Total items: {len(items)}\n")
+        print(f"Total items: {total}\n")
         print("== teamId counts (desc) ==")
         for k, v in team_sorted:
             print(f"{k}\t{v}")
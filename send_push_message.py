@@ -7,8 +7,9 @@ Send push notifications to all users in DynamoDB `users` table via Amazon SNS.
 import os
 import json
 import logging
+import argparse
 from typing import Dict, List
-import boto3
+import aws_clients
 from botocore.exceptions import ClientError
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
@@ -34,9 +35,13 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
 )
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
-sns      = boto3.client("sns", region_name=REGION)
-table    = dynamodb.Table(TABLE_NAME)
+
+def get_table():
+    return aws_clients.resource("dynamodb", region_name=REGION).Table(TABLE_NAME)
+
+def get_sns():
+    # 接続プールをスレッド数に合わせる（Connection pool is full 対策）
+    return aws_clients.client("sns", region_name=REGION, max_pool_connections=MAX_WORKERS)
 
 # ---------- DynamoDB 全件取得 ----------
 def scan_all(table) -> List[Dict]:
@@ -67,7 +72,7 @@ def send_push(user: Dict):
         return
 
     try:
-        sns.publish(
+        get_sns().publish(
             TargetArn=target_arn,
             MessageStructure="json",
             Message=json.dumps({
@@ -85,8 +90,11 @@ def send_push(user: Dict):
         with lock:
             failure += 1
 
-def main():
-    users = scan_all(table)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send push notifications to all users via Amazon SNS.")
+    parser.parse_args(argv)
+
+    users = scan_all(get_table())
 
     # ThreadPool で並列送信
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
@@ -0,0 +1,116 @@
+import json
+import subprocess
+import sys
+import types
+
+import benchmark
+
+
+def _result(scenario="send-push", rows=1000, wall=1.0, rss_inc=1000, calls=100, **extra):
+    r = {
+        "scenario": scenario,
+        "rows": rows,
+        "wall_time_s": wall,
+        "items_per_s": rows / wall,
+        "peak_rss_kb": 100000,
+        "peak_rss_increase_kb": rss_inc,
+        "api_calls_total": calls,
+    }
+    r.update(extra)
+    return r
+
+
+def _baseline(*results):
+    return {r["scenario"]: r for r in results}
+
+
+def test_compare_flags_metrics_beyond_threshold():
+    baseline = _baseline(_result())
+    assert benchmark.compare([_result(wall=1.19)], baseline, 0.2) == 0
+    assert benchmark.compare([_result(wall=1.5)], baseline, 0.2) == 1
+    assert benchmark.compare([_result(wall=1.5, rss_inc=2000, calls=200)], baseline, 0.2) == 3
+
+
+def test_compare_uses_rss_increase_not_process_peak():
+    baseline = _baseline(_result())
+    # プロセス全体のピーク（データ投入分を含む）が増えても、本処理中の増分が同じなら回帰ではない
+    assert benchmark.compare([_result(peak_rss_kb=900000)], baseline, 0.2) == 0
+
+
+def test_compare_skips_scenarios_without_comparable_baseline():
+    baseline = _baseline(_result(rows=1000))
+    assert benchmark.compare([_result(rows=2000, wall=10.0)], baseline, 0.2) == 0
+    assert benchmark.compare([_result(scenario="announce", wall=10.0)], baseline, 0.2) == 0
+
+
+def test_compare_ignores_missing_metrics():
+    baseline = _baseline(_result(rss_inc=None))
+    assert benchmark.compare([_result(rss_inc=5000)], baseline, 0.2) == 0
+
+
+def _write_baseline(path, *results):
+    path.write_text(json.dumps({"results": list(results)}), encoding="utf-8")
+
+
+def _fake_run(result):
+    def run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(result) + "\n")
+    return run
+
+
+def test_main_refuses_to_overwrite_the_baseline(tmp_path, monkeypatch):
+    base = tmp_path / "baseline.json"
+    _write_baseline(base, _result())
+    before = base.read_text(encoding="utf-8")
+    monkeypatch.setattr(benchmark.subprocess, "run", _fake_run(_result(wall=9.0)))
+
+    assert benchmark.main(["--rows", "1000", "--scenario", "send-push",
+                           "--output", str(base), "--compare", str(base)]) == 2
+    assert base.read_text(encoding="utf-8") == before
+
+
+def test_main_compares_against_baseline_read_before_writing(tmp_path, monkeypatch):
+    base = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    _write_baseline(base, _result())
+    monkeypatch.setattr(benchmark.subprocess, "run", _fake_run(_result(wall=9.0)))
+
+    assert benchmark.main(["--rows", "1000", "--scenario", "send-push",
+                           "--output", str(current), "--compare", str(base)]) == 1
+    assert json.loads(current.read_text(encoding="utf-8"))["results"][0]["wall_time_s"] == 9.0
+    assert json.loads(base.read_text(encoding="utf-8"))["results"][0]["wall_time_s"] == 1.0
+
+
+def test_compare_refuses_failed_scenarios():
+    baseline = _baseline(_result())
+    # 書き込みが全部失敗して速く終わった実行を改善として扱わない
+    assert benchmark.compare([_result(wall=0.1, exit_code=1)], baseline, 0.2) == 1
+    failed_baseline = _baseline(_result(exit_code=1))
+    assert benchmark.compare([_result(wall=9.0, exit_code=0)], failed_baseline, 0.2) == 0
+
+
+def test_main_exits_non_zero_when_a_scenario_fails(tmp_path, monkeypatch):
+    out = tmp_path / "out.json"
+    monkeypatch.setattr(benchmark.subprocess, "run", _fake_run(_result(exit_code=1)))
+
+    assert benchmark.main(["--rows", "1000", "--scenario", "send-push", "--output", str(out)]) == 1
+    assert json.loads(out.read_text(encoding="utf-8"))["results"][0]["exit_code"] == 1
+
+
+def test_scenario_run_returns_script_exit_code(monkeypatch):
+    for returned, expected in ((None, 0), (0, 0), (1, 1)):
+        module = types.SimpleNamespace(main=lambda argv, r=returned: r)
+        monkeypatch.setitem(sys.modules, "fake_script", module)
+        assert benchmark._main("fake_script", lambda d, b: [])("dir", "moto") == expected
+
+    def exits(argv):
+        raise SystemExit(2)
+    monkeypatch.setitem(sys.modules, "fake_script", types.SimpleNamespace(main=exits))
+    assert benchmark._main("fake_script", lambda d, b: [])("dir", "moto") == 2
+
+
+def test_transactional_scenarios_are_capped_on_moto_only():
+    cap = benchmark.MOTO_TRANSACT_MAX_ROWS
+    assert benchmark.SCENARIOS["announce"].rows_for(10000, "moto") == cap
+    assert benchmark.SCENARIOS["announce"].rows_for(10000, "local") == 10000
+    assert benchmark.SCENARIOS["send-push"].rows_for(10000, "moto") == 10000
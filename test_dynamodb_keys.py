@@ -0,0 +1,67 @@
+import pytest
+
+import dynamodb_keys
+
+
+class FakeClient:
+    """batch_get_item の n 回目（1 始まり）の応答を behaviors[n] で差し替える"""
+
+    def __init__(self, items, behaviors=None):
+        self.items = items
+        self.behaviors = behaviors or {}
+        self.calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        behavior = self.behaviors.get(self.calls)
+        if isinstance(behavior, Exception):
+            raise behavior
+        (table, req), = RequestItems.items()
+        if behavior == "unprocessed":
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        found = [self.items[k["pk"]["S"]] for k in req["Keys"] if k["pk"]["S"] in self.items]
+        return {"Responses": {table: found}}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(dynamodb_keys, "backoff_sleep", lambda attempt: None)
+
+
+def _items(n):
+    return {f"k{i}": {"pk": {"S": f"k{i}"}, "v": {"N": str(i)}} for i in range(n)}
+
+
+def test_returns_items_in_input_order_with_missing_as_none():
+    client = FakeClient(_items(150))
+    keys = [(f"k{i}",) for i in reversed(range(150))] + [("missing",)]
+    out = list(dynamodb_keys.iter_full_items(client, "t", ("pk",), keys))
+    assert [k for k, _, _ in out] == keys
+    assert out[0][1]["v"] == {"N": "149"}
+    assert out[-1][1:] == (None, None)
+    assert client.calls == 2
+
+
+def test_failed_chunk_is_reported_per_key_and_later_chunks_continue():
+    boom = RuntimeError("boom")
+    client = FakeClient(_items(250), {2: boom})
+    out = list(dynamodb_keys.iter_full_items(client, "t", ("pk",), [(f"k{i}",) for i in range(250)]))
+    assert len(out) == 250
+    assert all(e is None and it is not None for _, it, e in out[:100])
+    assert all(e is boom and it is None for _, it, e in out[100:200])
+    assert all(e is None and it is not None for _, it, e in out[200:])
+
+
+def test_unprocessed_keys_give_up_after_max_attempts():
+    attempts = dynamodb_keys.MAX_UNPROCESSED_ATTEMPTS
+    client = FakeClient(_items(3), {n: "unprocessed" for n in range(1, attempts + 1)})
+    out = list(dynamodb_keys.iter_full_items(client, "t", ("pk",), [("k0",), ("k1",)]))
+    assert client.calls == attempts
+    assert all(it is None and isinstance(e, RuntimeError) for _, it, e in out)
+
+
+def test_unprocessed_keys_are_resent_until_processed():
+    client = FakeClient(_items(3), {1: "unprocessed", 2: "unprocessed"})
+    out = list(dynamodb_keys.iter_full_items(client, "t", ("pk",), [("k0",), ("k2",)]))
+    assert client.calls == 3
+    assert [it["v"]["N"] for _, it, _ in out] == ["0", "2"]
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+import import_matches_from_csv as imp
+from import_matches_from_csv import MATCHDAY_WINDOW, assign_match_id, parse_utc_date, resolve_match_id
+
+WINDOW = timedelta(days=3)
+KEY = ("10-20", 2021)
+
+
+def _index(*entries):
+    return {KEY: [(md, parse_utc_date(d), match_id) for md, d, match_id in entries]}
+
+
+def _item(utc_date, matchday="5", home=10, away=20, competition_id=2021):
+    return {
+        "id": None,
+        "utcDate": utc_date,
+        "matchday": matchday,
+        "home_team_id": home,
+        "away_team_id": away,
+        "competition_id": competition_id,
+        "matchup_key": imp.generate_matchup_key(home, away),
+    }
+
+
+def test_same_matchday_resolves_within_matchday_window():
+    edge = parse_utc_date("2026-01-01T15:00:00Z") + MATCHDAY_WINDOW
+    index = _index(("5", "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, "5", edge, WINDOW) == "old"
+
+    index = _index(("5", "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, "5", edge + timedelta(seconds=1), WINDOW) is None
+
+
+def test_without_matchday_uses_window_edges():
+    edge = parse_utc_date("2026-01-01T15:00:00Z") + WINDOW
+    index = _index((None, "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, None, edge, WINDOW) == "old"
+
+    index = _index((None, "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, None, edge + timedelta(seconds=1), WINDOW) is None
+
+
+def test_matchday_filled_in_or_changed_falls_back_within_window():
+    shifted = parse_utc_date("2026-01-02T15:00:00Z")
+    # 初回は matchday 空で取り込まれ、後から埋まった
+    index = _index((None, "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, "5", shifted, WINDOW) == "old"
+    # matchday が変わった
+    index = _index(("5", "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, "6", shifted, WINDOW) == "old"
+    # matchday が消えた
+    index = _index(("5", "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, None, shifted, WINDOW) == "old"
+
+
+def test_fallback_across_matchdays_is_limited_to_window():
+    index = _index(("5", "2026-01-01T15:00:00Z", "old"))
+    assert resolve_match_id(index, KEY, "6", parse_utc_date("2026-01-10T15:00:00Z"), WINDOW) is None
+    assert len(index[KEY]) == 1
+
+
+def test_same_matchday_wins_over_closer_other_matchday():
+    index = _index(
+        ("6", "2026-01-03T15:00:00Z", "other"),
+        ("5", "2026-01-01T15:00:00Z", "same"),
+    )
+    assert resolve_match_id(index, KEY, "5", parse_utc_date("2026-01-03T15:00:00Z"), WINDOW) == "same"
+
+
+def test_none_dates_only_match_each_other():
+    index = _index(("5", None, "undated"))
+    assert resolve_match_id(index, KEY, "5", parse_utc_date("2026-01-01T15:00:00Z"), WINDOW) is None
+    assert resolve_match_id(index, KEY, "5", None, WINDOW) == "undated"
+
+    index = _index(("5", "2026-01-01T15:00:00Z", "dated"))
+    assert resolve_match_id(index, KEY, "5", None, WINDOW) is None
+
+
+def test_resolved_candidate_is_popped():
+    index = _index(
+        ("5", "2026-01-01T15:00:00Z", "first"),
+        ("5", "2026-01-08T15:00:00Z", "second"),
+    )
+    assert resolve_match_id(index, KEY, "5", parse_utc_date("2026-01-01T15:00:00Z"), WINDOW) == "first"
+    assert [c[2] for c in index[KEY]] == ["second"]
+    assert resolve_match_id(index, KEY, "5", parse_utc_date("2026-01-01T15:00:00Z"), WINDOW) == "second"
+    assert index[KEY] == []
+    assert resolve_match_id(index, KEY, "5", parse_utc_date("2026-01-01T15:00:00Z"), WINDOW) is None
+
+
+def test_unknown_key_returns_none():
+    assert resolve_match_id({}, KEY, "5", parse_utc_date("2026-01-01T15:00:00Z"), WINDOW) is None
+
+
+def test_assign_generates_id_for_new_match_and_adds_it_back():
+    index = {}
+    item = _item("2026-03-01T15:00:00Z")
+    match_id = assign_match_id(index, item, WINDOW)
+    assert match_id == imp.generate_match_id(10, 20, "2026-03-01T15:00:00Z")
+    assert index[KEY] == [("5", parse_utc_date("2026-03-01T15:00:00Z"), match_id)]
+
+
+def test_assign_reuses_id_when_match_reappears_in_later_file():
+    index = {}
+    first = assign_match_id(index, _item("2026-03-01T15:00:00Z", matchday=""), WINDOW)
+    # 別ファイルで日程変更・matchday 付きで再登場
+    second = assign_match_id(index, _item("2026-03-03T15:00:00Z", matchday="5", home=20, away=10), WINDOW)
+    assert second == first
+    # 索引には最新の日時で1件だけ残る
+    assert index[KEY] == [("5", parse_utc_date("2026-03-03T15:00:00Z"), first)]
+
+
+def test_assign_existing_id_from_table_index():
+    index = _index(("5", "2026-03-01T15:00:00Z", "from-table"))
+    assert assign_match_id(index, _item("2026-03-02T15:00:00Z"), WINDOW) == "from-table"
+    assert assign_match_id(index, _item("2026-03-02T15:00:00Z"), WINDOW) == "from-table"